@@ -31,6 +31,8 @@ struct SessionOptions {
     bool enable_operator_fusion = true;
     bool enable_quantization = false;
     DataType quantization_dtype = DataType::INT8;
+    // 优化后的图保存路径 (参考ONNX Runtime的optimized_model_filepath)，为空则不保存
+    std::string optimized_model_filepath;
     
     // 性能配置
     int num_threads = 0;  // 0表示自动 (参考ONNX Runtime的线程配置)
@@ -8,6 +8,8 @@ import inferunity_py as iu
 options = iu.SessionOptions()
 options.execution_providers = ["CPUExecutionProvider"]
 options.graph_optimization_level = iu.GraphOptimizationLevel.ALL
+# 可选：保存优化后的图，便于检查算子融合结果（文本格式，不含权重，不能直接作为模型加载）
+# options.optimized_model_filepath = "model.opt.txt"
 
 session = iu.InferenceSession.create(options)
 
@@ -74,6 +74,7 @@ void bind_session_options(py::module& m) {
         .def_readwrite("device_id", &SessionOptions::device_id)
         .def_readwrite("graph_optimization_level", &SessionOptions::graph_optimization_level)
         .def_readwrite("enable_operator_fusion", &SessionOptions::enable_operator_fusion)
+        .def_readwrite("optimized_model_filepath", &SessionOptions::optimized_model_filepath)
         .def_readwrite("num_threads", &SessionOptions::num_threads)
         .def_readwrite("max_batch_size", &SessionOptions::max_batch_size)
         .def_readwrite("enable_profiling", &SessionOptions::enable_profiling);
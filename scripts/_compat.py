@@ -0,0 +1,8 @@
+#!/usr/bin/env python3
+"""
+在导入optimum之前导入本模块
+optimum的model_patcher在导入时引用torch.rms_norm，旧版PyTorch没有该函数
+这里在进程内补上，不再修改已安装的optimum文件
+"""
+
+import patch_torch_rmsnorm  # noqa: F401
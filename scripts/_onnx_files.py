@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+convert_qwen_*脚本共用的ONNX文件处理函数
+"""
+
+import os
+import shutil
+
+# 外部权重文件的后缀（>2GB的模型会把权重写到.onnx旁边）
+EXTERNAL_DATA_SUFFIXES = ("_data", ".data")
+
+
+def _move_file(src, dst):
+    """同一文件系统上直接重命名，否则尝试硬链接，最后才复制"""
+    try:
+        os.replace(src, dst)
+    except OSError:
+        try:
+            os.link(src, dst)
+        except OSError:
+            shutil.copy2(src, dst)
+
+
+def move_onnx(src, dst):
+    """移动ONNX模型及其外部权重文件，避免重新读写整个模型"""
+    src = str(src)
+    dst = str(dst)
+    _move_file(src, dst)
+    
+    # 外部权重按文件名引用，只能移动目录，不能改名
+    src_dir = os.path.dirname(src) or "."
+    dst_dir = os.path.dirname(dst) or "."
+    if os.path.abspath(src_dir) == os.path.abspath(dst_dir):
+        return
+    for suffix in EXTERNAL_DATA_SUFFIXES:
+        data_file = src + suffix
+        if os.path.exists(data_file):
+            _move_file(data_file, os.path.join(dst_dir, os.path.basename(data_file)))
+
+
+def find_onnx_files(output_dir):
+    """
+    一次scandir列出目录中的ONNX文件，返回[(文件名, 大小)]
+    主模型排在最前：优先decoder_model.onnx，其次decoder_model*，再按大小降序
+    """
+    with os.scandir(output_dir) as it:
+        entries = [(e.name, e.stat().st_size) for e in it
+                   if e.is_file() and e.name.endswith(".onnx")]
+    entries.sort(key=lambda e: (e[0] != "decoder_model.onnx",
+                                not e[0].startswith("decoder_model"),
+                                -e[1],
+                                e[0]))
+    return entries
+
+
+def save_external_data(model_path):
+    """
+    torch.onnx.export在模型超过2GB时会把每个权重写成单独的文件，这里合并为
+    单个外部数据文件（<模型文件名>.data），便于加载时mmap，并删除原来的分片
+    未超过2GB的模型保持单文件不变：inferunity的ONNX解析器只读取内嵌的raw_data
+    """
+    import onnx
+    from onnx.external_data_helper import uses_external_data
+    
+    model_path = str(model_path)
+    model_dir = os.path.dirname(model_path)
+    model = onnx.load(model_path, load_external_data=False)
+    shards = set()
+    for tensor in model.graph.initializer:
+        if uses_external_data(tensor):
+            for entry in tensor.external_data:
+                if entry.key == "location":
+                    shards.add(entry.value)
+    if not shards:
+        return
+    
+    model = onnx.load(model_path)
+    location = os.path.basename(model_path) + ".data"
+    # onnx会追加写入已存在的数据文件，先删除上次运行留下的文件
+    data_path = os.path.join(model_dir, location)
+    if os.path.exists(data_path):
+        os.remove(data_path)
+    onnx.save_model(
+        model,
+        model_path,
+        save_as_external_data=True,
+        all_tensors_to_one_file=True,
+        location=location,
+        size_threshold=1024
+    )
+    for shard in shards - {location}:
+        shard_path = os.path.join(model_dir, shard)
+        if os.path.exists(shard_path):
+            os.remove(shard_path)
+
+
+def _run_feeds(session, input_ids, past=None):
+    """
+    按session的输入构造feeds：attention_mask全1，position_ids接在past之后
+    past为None时past_*输入使用长度为0的张量，否则按输入顺序依次使用past
+    """
+    import numpy as np
+    
+    batch_size, seq_len = input_ids.shape
+    past_len = 0 if past is None else past[0].shape[2]
+    feeds = {}
+    past_index = 0
+    for inp in session.get_inputs():
+        if inp.name == "input_ids":
+            feeds[inp.name] = input_ids
+        elif inp.name == "attention_mask":
+            feeds[inp.name] = np.ones((batch_size, past_len + seq_len), dtype=np.int64)
+        elif inp.name == "position_ids":
+            position_ids = np.arange(past_len, past_len + seq_len, dtype=np.int64)
+            feeds[inp.name] = np.repeat(position_ids[None, :], batch_size, axis=0)
+        elif past is not None:
+            feeds[inp.name] = past[past_index]
+            past_index += 1
+        else:
+            # 动态维度：batch取input_ids的batch，其余（past长度）取0
+            shape = []
+            for i, dim in enumerate(inp.shape):
+                if isinstance(dim, int):
+                    shape.append(dim)
+                else:
+                    shape.append(batch_size if i == 0 else 0)
+            feeds[inp.name] = np.zeros(shape, dtype=np.float32)
+    return feeds
+
+
+def validate_onnx(model_path, input_ids):
+    """用onnxruntime运行一次导出的模型做基本检查，past输入使用空张量"""
+    import onnxruntime as ort
+    
+    session = ort.InferenceSession(str(model_path), providers=["CPUExecutionProvider"])
+    outputs = session.run(None, _run_feeds(session, input_ids))
+    print(f"✅ 验证通过: {session.get_outputs()[0].name} 形状 {outputs[0].shape}")
+
+
+def validate_decoder_with_past(model_path, input_ids, atol=1e-3):
+    """
+    检查带KV cache的decoder：先对前n-1个token做prefill，再把present作为past
+    解码最后一个token，结果应与n个token的完整前向在最后位置一致
+    """
+    import numpy as np
+    import onnxruntime as ort
+    
+    if input_ids.shape[1] < 2:
+        raise ValueError("验证增量解码至少需要2个token")
+    session = ort.InferenceSession(str(model_path), providers=["CPUExecutionProvider"])
+    
+    _, *present = session.run(None, _run_feeds(session, input_ids[:, :-1]))
+    step_hidden, *step_present = session.run(None, _run_feeds(session, input_ids[:, -1:], present))
+    full_hidden = session.run(None, _run_feeds(session, input_ids))[0]
+    
+    if step_present[0].shape[2] != input_ids.shape[1]:
+        raise RuntimeError(f"present长度错误: {step_present[0].shape[2]}，应为{input_ids.shape[1]}")
+    max_diff = float(np.abs(step_hidden[:, -1] - full_hidden[:, -1]).max())
+    if max_diff > atol:
+        raise RuntimeError(f"增量解码结果与完整前向不一致（最大误差 {max_diff:.2e}）")
+    print(f"✅ 验证通过: 增量解码与完整前向一致（最大误差 {max_diff:.2e}）")
+
+
+def quantize_int8(model_path):
+    """对导出的ONNX模型做动态INT8量化（仅MatMul/Gemm权重），返回量化模型路径"""
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    
+    model_path = str(model_path)
+    # 只改文件名的后缀，不能替换目录名中的".onnx"
+    base, ext = os.path.splitext(model_path)
+    quantized_path = base + ".int8" + ext
+    if os.path.abspath(quantized_path) == os.path.abspath(model_path):
+        raise ValueError(f"量化输出会覆盖原模型: {model_path}")
+    print(f"正在进行INT8动态量化: {model_path}")
+    quantize_dynamic(
+        model_path,
+        quantized_path,
+        weight_type=QuantType.QInt8,
+        op_types_to_quantize=["MatMul", "Gemm"]
+    )
+    size_mb = os.path.getsize(quantized_path) / (1024 * 1024)
+    print(f"✅ INT8量化模型: {quantized_path} ({size_mb:.2f} MB)")
+    return quantized_path
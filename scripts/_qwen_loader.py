@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+convert_qwen_*脚本共用的模型加载函数
+按checkpoint自身精度以低内存方式加载权重；同一进程内（如optimum失败后回退到torch.onnx.export）
+只加载一次，每次运行脚本仍会重新读取safetensors
+load()返回的是共享的缓存对象，不能原地修改；需要其它精度时用cast()得到副本
+"""
+
+import copy
+import functools
+
+import torch
+from transformers import AutoModel, AutoTokenizer
+
+# 导出精度：fp32为默认；bf16直接以checkpoint精度trace，权重带宽减半，
+# 但需要推理端支持BF16 MatMul/Gemm
+EXPORT_DTYPES = {
+    "fp32": torch.float32,
+    "bf16": torch.bfloat16,
+}
+
+
+@functools.lru_cache(maxsize=None)
+def load(model_path):
+    """加载模型（checkpoint精度，low_cpu_mem_usage），同一路径只加载一次"""
+    model = AutoModel.from_pretrained(
+        model_path,
+        low_cpu_mem_usage=True,
+        dtype="auto"
+    )
+    # 只用于导出，关闭梯度避免tracing时的autograd开销
+    model.requires_grad_(False)
+    return model.eval()
+
+
+def cast(module, dtype):
+    """返回dtype精度的module；精度已一致时直接返回，否则转换副本，不修改缓存的模型"""
+    if all(p.dtype == dtype for p in module.parameters()):
+        return module
+    return copy.deepcopy(module).to(dtype)
+
+
+@functools.lru_cache(maxsize=None)
+def load_tokenizer(model_path):
+    """加载分词器，同一路径只加载一次"""
+    return AutoTokenizer.from_pretrained(model_path)
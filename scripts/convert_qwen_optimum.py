@@ -7,7 +7,9 @@ optimum库支持更多模型类型，包括qwen2
 import os
 import sys
 import argparse
-from pathlib import Path
+
+import _compat
+from _onnx_files import find_onnx_files, move_onnx, quantize_int8
 
 try:
     from optimum.exporters.onnx import main_export
@@ -42,34 +44,24 @@ def convert_with_optimum(model_path, output_path):
             opset=14,
         )
         
-        # 查找生成的ONNX文件
-        onnx_files = list(Path(output_dir).glob("*.onnx"))
+        # 查找生成的ONNX文件，主要的模型文件（通常是decoder_model.onnx）排在最前
+        onnx_files = find_onnx_files(output_dir)
         if onnx_files:
-            # 如果生成了多个文件，找到主要的模型文件
-            # 通常decoder_model.onnx是主要的
-            main_file = None
-            for f in onnx_files:
-                if "decoder_model" in f.name or "model" in f.name:
-                    main_file = f
-                    break
+            main_file = os.path.join(output_dir, onnx_files[0][0])
             
-            if not main_file:
-                main_file = onnx_files[0]
+            # 显示所有生成的文件
+            print(f"\n生成的文件:")
+            for name, size in onnx_files:
+                size_mb = size / (1024 * 1024)
+                print(f"  - {name} ({size_mb:.2f} MB)")
             
-            # 如果指定了具体文件名，移动或复制
-            if str(main_file) != output_path:
-                import shutil
-                shutil.copy2(str(main_file), output_path)
+            # 如果指定了具体文件名，移动（不重新读写模型数据）
+            if main_file != output_path:
+                move_onnx(main_file, output_path)
                 print(f"✅ ONNX模型已保存到: {output_path}")
             else:
                 print(f"✅ ONNX模型已保存到: {output_path}")
             
-            # 显示所有生成的文件
-            print(f"\n生成的文件:")
-            for f in onnx_files:
-                size_mb = f.stat().st_size / (1024 * 1024)
-                print(f"  - {f.name} ({size_mb:.2f} MB)")
-            
             return True
         else:
             print("❌ 未找到生成的ONNX文件")
@@ -78,8 +70,9 @@ def convert_with_optimum(model_path, output_path):
                 
     except Exception as e:
         print(f"❌ 转换失败: {e}")
-        import traceback
-        traceback.print_exc()
+        if os.environ.get("INFERUNITY_DEBUG"):
+            import traceback
+            traceback.print_exc()
         return False
 
 def main():
@@ -90,6 +83,8 @@ def main():
     parser.add_argument("--output", type=str,
                        default="models/Qwen2.5-0.5B/qwen2.5-0.5b.onnx",
                        help="输出ONNX文件路径")
+    parser.add_argument("--quantize", choices=["int8"], default=None,
+                       help="导出后进行量化（int8: 动态INT8量化）")
     
     args = parser.parse_args()
     
@@ -104,6 +99,8 @@ def main():
         print(f"\n✅ 转换完成!")
         print(f"   主文件: {args.output}")
         print(f"   大小: {size_mb:.2f} MB")
+        if args.quantize == "int8":
+            quantize_int8(args.output)
         return 0
     else:
         return 1
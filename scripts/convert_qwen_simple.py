@@ -6,111 +6,175 @@
 
 import os
 import sys
+import multiprocessing as mp
 import torch
 import torch.nn as nn
-from transformers import AutoModel, AutoTokenizer
 
-def convert_qwen_simple(model_path, output_path):
-    """使用简化的方法转换Qwen模型"""
-    print(f"正在加载模型: {model_path}")
-    
-    try:
-        model = AutoModel.from_pretrained(model_path, dtype=torch.float32)
-        tokenizer = AutoTokenizer.from_pretrained(model_path)
-        model.eval()
-        print("✅ 模型加载成功")
-    except Exception as e:
-        print(f"❌ 模型加载失败: {e}")
-        return False
-    
-    # 创建输出目录
-    output_dir = os.path.dirname(output_path)
-    if output_dir and not os.path.exists(output_dir):
-        os.makedirs(output_dir)
+import _qwen_loader
+from _onnx_files import quantize_int8, save_external_data, validate_onnx
+
+# 创建一个更简单的包装器，只导出embedding层
+# 这样可以避免复杂操作符
+class EmbeddingOnlyWrapper(nn.Module):
+    def __init__(self, model, torch_dtype):
+        super().__init__()
+        # 仅将embedding层转换为导出精度
+        self.embedding = _qwen_loader.cast(model.get_input_embeddings(), torch_dtype)
     
-    # 创建一个更简单的包装器，只导出embedding层
-    # 这样可以避免复杂操作符
-    class EmbeddingOnlyWrapper(nn.Module):
-        def __init__(self, model):
-            super().__init__()
-            self.embedding = model.get_input_embeddings()
-        
-        def forward(self, input_ids):
+    def forward(self, input_ids):
+        with torch.autocast("cpu", enabled=False):
             return self.embedding(input_ids)
+
+class SimpleWrapper(nn.Module):
+    def __init__(self, model, torch_dtype):
+        super().__init__()
+        # 在包装器边界处把权重转换为导出精度
+        self.model = _qwen_loader.cast(model, torch_dtype)
     
-    # 尝试导出embedding层
+    def forward(self, input_ids):
+        # 使用更简单的forward，避免复杂操作
+        with torch.autocast("cpu", enabled=False):
+            outputs = self.model(input_ids=input_ids, use_cache=False)
+        return outputs.last_hidden_state
+
+def _export_embedding(model, output_path, torch_dtype):
+    """导出embedding层，失败不影响整体结果"""
     print("尝试导出embedding层...")
-    embedding_wrapper = EmbeddingOnlyWrapper(model)
+    embedding_wrapper = EmbeddingOnlyWrapper(model, torch_dtype)
     embedding_wrapper.eval()
     
-    # 准备输入
-    dummy_input = tokenizer("Hello", return_tensors="pt", max_length=8, padding=True, truncation=True)
-    input_ids = dummy_input["input_ids"]
+    # 准备输入：导出只关心形状和类型，不需要真实token
+    input_ids = torch.zeros((1, 8), dtype=torch.long)
     print(f"输入形状: {input_ids.shape}")
     
     try:
         # 导出embedding层
-        embedding_path = output_path.replace('.onnx', '_embedding.onnx')
-        torch.onnx.export(
-            embedding_wrapper,
-            input_ids,
-            embedding_path,
-            input_names=["input_ids"],
-            output_names=["embeddings"],
-            opset_version=11,
-            do_constant_folding=False,
-            verbose=False
-        )
+        # 只替换扩展名，保证与完整模型的输出路径不同（两者可能并行写入）
+        base, ext = os.path.splitext(output_path)
+        embedding_path = base + "_embedding" + (ext or ".onnx")
+        with torch.no_grad():
+            torch.onnx.export(
+                embedding_wrapper,
+                input_ids,
+                embedding_path,
+                input_names=["input_ids"],
+                output_names=["embeddings"],
+                dynamic_axes={
+                    "input_ids": {0: "batch_size", 1: "sequence_length"},
+                    "embeddings": {0: "batch_size", 1: "sequence_length"}
+                },
+                opset_version=17,
+                do_constant_folding=True,
+                verbose=False
+            )
+        save_external_data(embedding_path)
         print(f"✅ Embedding层导出成功: {embedding_path}")
     except Exception as e:
         print(f"⚠️  Embedding层导出失败: {e}")
-    
-    # 尝试导出完整模型（使用更短的序列）
+
+def _export_full(model, output_path, torch_dtype):
+    """导出完整模型（使用更短的序列）"""
     print("\n尝试导出完整模型（简化版）...")
-    
-    class SimpleWrapper(nn.Module):
-        def __init__(self, model):
-            super().__init__()
-            self.model = model
-        
-        def forward(self, input_ids):
-            # 使用更简单的forward，避免复杂操作
-            outputs = self.model(input_ids=input_ids, use_cache=False)
-            return outputs.last_hidden_state
-    
-    simple_wrapper = SimpleWrapper(model)
+    simple_wrapper = SimpleWrapper(model, torch_dtype)
     simple_wrapper.eval()
     
     # 使用更短的输入序列
-    short_input = torch.randint(0, 100, (1, 4), dtype=torch.long)
+    short_input = torch.zeros((1, 4), dtype=torch.long)
     print(f"使用短输入序列: {short_input.shape}")
     
     try:
-        torch.onnx.export(
-            simple_wrapper,
-            short_input,
-            output_path,
-            input_names=["input_ids"],
-            output_names=["hidden_states"],
-            opset_version=11,
-            do_constant_folding=False,
-            verbose=True
-        )
+        with torch.no_grad():
+            torch.onnx.export(
+                simple_wrapper,
+                short_input,
+                output_path,
+                input_names=["input_ids"],
+                output_names=["hidden_states"],
+                dynamic_axes={
+                    "input_ids": {0: "batch_size", 1: "sequence_length"},
+                    "hidden_states": {0: "batch_size", 1: "sequence_length"}
+                },
+                opset_version=17,
+                do_constant_folding=True,
+                verbose=False
+            )
+        save_external_data(output_path)
         print(f"✅ 完整模型导出成功: {output_path}")
         return True
     except Exception as e:
         print(f"❌ 完整模型导出失败: {e}")
-        import traceback
-        traceback.print_exc()
+        if os.environ.get("INFERUNITY_DEBUG"):
+            import traceback
+            traceback.print_exc()
         return False
 
+def _export_embedding_worker(model, output_path, torch_dtype):
+    """在fork出的子进程中导出embedding层"""
+    # embedding导出很轻，只用一个线程，把其余线程留给父进程中的完整模型导出
+    torch.set_num_threads(1)
+    _export_embedding(model, output_path, torch_dtype)
+
+def convert_qwen_simple(model_path, output_path, validate=False, dtype="fp32"):
+    """使用简化的方法转换Qwen模型"""
+    print(f"正在加载模型: {model_path}")
+    
+    try:
+        model = _qwen_loader.load(model_path)
+        torch_dtype = _qwen_loader.EXPORT_DTYPES[dtype]
+        print("✅ 模型加载成功")
+    except Exception as e:
+        print(f"❌ 模型加载失败: {e}")
+        return False
+    
+    # 创建输出目录
+    output_dir = os.path.dirname(output_path)
+    if output_dir and not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    
+    # embedding和完整模型的导出互不依赖：Linux上embedding在fork出的子进程中导出
+    # （写时复制共享模型，不经过pickle），完整模型在当前进程中使用全部线程导出。
+    # macOS上在已加载torch并启动线程的进程中fork不安全，与其它平台一样顺序导出
+    if sys.platform.startswith("linux"):
+        worker = mp.get_context("fork").Process(
+            target=_export_embedding_worker,
+            args=(model, output_path, torch_dtype)
+        )
+        worker.start()
+        try:
+            success = _export_full(model, output_path, torch_dtype)
+        finally:
+            worker.join()
+        if worker.exitcode != 0:
+            # 子进程被杀死或崩溃，embedding失败不影响整体结果
+            print(f"⚠️  Embedding层导出进程异常退出 (exitcode={worker.exitcode})")
+    else:
+        _export_embedding(model, output_path, torch_dtype)
+        success = _export_full(model, output_path, torch_dtype)
+    
+    if success and validate:
+        try:
+            tokenizer = _qwen_loader.load_tokenizer(model_path)
+            inputs = tokenizer("Hello", return_tensors="np")
+            validate_onnx(output_path, inputs["input_ids"])
+        except Exception as e:
+            print(f"❌ 验证失败: {e}")
+            return False
+    return success
+
 if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser()
     parser.add_argument("--model_path", default="models/Qwen2.5-0.5B")
     parser.add_argument("--output", default="models/Qwen2.5-0.5B/qwen2.5-0.5b.onnx")
+    parser.add_argument("--quantize", choices=["int8"], default=None)
+    parser.add_argument("--validate", action="store_true")
+    parser.add_argument("--dtype", choices=sorted(_qwen_loader.EXPORT_DTYPES), default="fp32")
     args = parser.parse_args()
+    # onnxruntime的动态INT8量化和CPU推理都不支持bfloat16的权重/输出
+    if args.dtype == "bf16" and (args.quantize or args.validate):
+        parser.error("--dtype bf16 不能与 --quantize/--validate 同时使用")
     
-    success = convert_qwen_simple(args.model_path, args.output)
+    success = convert_qwen_simple(args.model_path, args.output, args.validate, args.dtype)
+    if success and args.quantize == "int8":
+        quantize_int8(args.output)
     sys.exit(0 if success else 1)
-
@@ -8,19 +8,28 @@ import os
 import sys
 import argparse
 
+import torch
+import torch.nn as nn
+
+import _compat
+import _qwen_loader
+from _onnx_files import (find_onnx_files, move_onnx, quantize_int8, save_external_data,
+                         validate_decoder_with_past, validate_onnx)
+
+try:
+    from transformers import DynamicCache
+except ImportError:
+    DynamicCache = None
+
 try:
     from optimum.onnxruntime import ORTModelForCausalLM
-    from transformers import AutoTokenizer
     USE_OPTIMUM = True
 except ImportError:
     print("⚠️  optimum库未安装，尝试使用torch.onnx.export")
     print("   建议安装: pip install optimum[onnxruntime]")
     USE_OPTIMUM = False
-    import torch
-    import torch.nn as nn
-    from transformers import AutoModel, AutoTokenizer
 
-def convert_to_onnx(model_path, output_path, max_length=128):
+def convert_to_onnx(model_path, output_path, max_length=128, static_shapes=False, validate=False):
     """将Qwen模型转换为ONNX格式"""
     print(f"正在加载模型: {model_path}")
     
@@ -37,20 +46,19 @@ def convert_to_onnx(model_path, output_path, max_length=128):
             model = ORTModelForCausalLM.from_pretrained(
                 model_path,
                 export=True,
-                use_io_binding=False
+                use_io_binding=True
             )
             
             # 保存ONNX模型
             model.save_pretrained(output_dir)
             
             # 查找生成的ONNX文件
-            onnx_files = [f for f in os.listdir(output_dir) if f.endswith('.onnx')]
+            onnx_files = find_onnx_files(output_dir)
             if onnx_files:
-                # 如果生成了多个文件，使用第一个（通常是decoder_model.onnx）
-                generated_file = os.path.join(output_dir, onnx_files[0])
+                # 如果生成了多个文件，使用主要的模型文件（通常是decoder_model.onnx）
+                generated_file = os.path.join(output_dir, onnx_files[0][0])
                 if generated_file != output_path:
-                    import shutil
-                    shutil.move(generated_file, output_path)
+                    move_onnx(generated_file, output_path)
                     print(f"✅ ONNX模型已保存到: {output_path}")
                 else:
                     print(f"✅ ONNX模型已保存到: {output_path}")
@@ -62,66 +70,141 @@ def convert_to_onnx(model_path, output_path, max_length=128):
         except Exception as e:
             print(f"❌ 使用optimum转换失败: {e}")
             print("   尝试使用torch.onnx.export...")
-            import traceback
-            traceback.print_exc()
+            if os.environ.get("INFERUNITY_DEBUG"):
+                import traceback
+                traceback.print_exc()
             # 继续尝试torch.onnx.export
     
     # 使用torch.onnx.export（备用方式）
     try:
-        model = AutoModel.from_pretrained(model_path, torch_dtype=torch.float32)
-        tokenizer = AutoTokenizer.from_pretrained(model_path)
+        model = _qwen_loader.load(model_path)
     except Exception as e:
         print(f"❌ 加载模型失败: {e}")
         return False
     
-    model.eval()
     print("✅ 模型加载成功")
     
-    # 创建一个包装类来避免参数冲突
-    class ModelWrapper(nn.Module):
+    # 带KV cache的decoder包装器：输入past，输出present，支持增量解码
+    class DecoderWithPast(nn.Module):
         def __init__(self, model):
             super().__init__()
-            self.model = model
+            # 导出FP32图，在包装器边界处转换权重
+            self.model = _qwen_loader.cast(model, torch.float32)
         
-        def forward(self, input_ids):
-            outputs = self.model(input_ids=input_ids)
-            return outputs.last_hidden_state
+        def forward(self, input_ids, attention_mask, position_ids, *past):
+            # 不传past时（固定形状导出）不使用KV cache，只输出last_hidden_state
+            if not past:
+                with torch.autocast("cpu", enabled=False):
+                    outputs = self.model(
+                        input_ids=input_ids,
+                        attention_mask=attention_mask,
+                        position_ids=position_ids,
+                        use_cache=False
+                    )
+                return (outputs.last_hidden_state,)
+            
+            past_key_values = tuple(zip(past[::2], past[1::2]))
+            if DynamicCache is not None:
+                past_key_values = DynamicCache.from_legacy_cache(past_key_values)
+            with torch.autocast("cpu", enabled=False):
+                outputs = self.model(
+                    input_ids=input_ids,
+                    attention_mask=attention_mask,
+                    position_ids=position_ids,
+                    past_key_values=past_key_values,
+                    use_cache=True
+                )
+            present = outputs.past_key_values
+            if hasattr(present, "to_legacy_cache"):
+                present = present.to_legacy_cache()
+            return (outputs.last_hidden_state,) + sum(present, ())
     
-    wrapped_model = ModelWrapper(model)
+    wrapped_model = DecoderWithPast(model)
     wrapped_model.eval()
     
     # 准备输入
     print(f"准备输入 (max_length={max_length})...")
-    dummy_text = "Hello, how are you?"
-    inputs = tokenizer(dummy_text, return_tensors="pt", padding=True, truncation=True, max_length=max_length)
-    input_ids = inputs["input_ids"]
+    # 导出只关心形状和类型，不需要真实token；固定形状时导出seq_len=max_length的图
+    seq_len = max_length if static_shapes else 8
+    input_ids = torch.zeros((1, seq_len), dtype=torch.long)
     
     print(f"输入形状: {input_ids.shape}")
     
+    # 与optimum相同，用非空的past trace：past长度为0时，模型中依赖形状的分支
+    # （因果mask、is_causal）会按prefill固定下来，增量解码时结果错误
+    # past: [batch, num_kv_heads, past_len, head_dim]
+    # 固定形状时past长度会被固定，无法增量解码，因此不导出past/present
+    config = model.config
+    num_layers = 0 if static_shapes else config.num_hidden_layers
+    num_kv_heads = getattr(config, "num_key_value_heads", config.num_attention_heads)
+    head_dim = getattr(config, "head_dim", None) or config.hidden_size // config.num_attention_heads
+    batch_size = input_ids.shape[0]
+    past_len = 0 if static_shapes else 2
+    dummy_past = []
+    for _ in range(num_layers):
+        dummy_past.append(torch.zeros(batch_size, num_kv_heads, past_len, head_dim))
+        dummy_past.append(torch.zeros(batch_size, num_kv_heads, past_len, head_dim))
+    attention_mask = torch.ones((batch_size, past_len + seq_len), dtype=torch.long)
+    position_ids = torch.arange(past_len, past_len + seq_len, dtype=torch.long).unsqueeze(0)
+    
+    input_names = ["input_ids", "attention_mask", "position_ids"]
+    output_names = ["last_hidden_state"]
+    dynamic_axes = {
+        "input_ids": {0: "batch_size", 1: "sequence_length"},
+        "attention_mask": {0: "batch_size", 1: "total_sequence_length"},
+        "position_ids": {0: "batch_size", 1: "sequence_length"},
+        "last_hidden_state": {0: "batch_size", 1: "sequence_length"}
+    }
+    for i in range(num_layers):
+        for kind in ("k", "v"):
+            past_name = f"past_{kind}_{i}"
+            present_name = f"present_{kind}_{i}"
+            input_names.append(past_name)
+            output_names.append(present_name)
+            dynamic_axes[past_name] = {0: "batch_size", 2: "past_sequence_length"}
+            dynamic_axes[present_name] = {0: "batch_size", 2: "total_sequence_length"}
+    if static_shapes:
+        # 固定形状、无KV cache，ORT可以预先规划内存
+        dynamic_axes = None
+    
     # 导出ONNX（使用更高的opset版本）
     print(f"\n正在导出ONNX模型到: {output_path}")
     try:
-        torch.onnx.export(
-            wrapped_model,
-            input_ids,
-            output_path,
-            input_names=["input_ids"],
-            output_names=["last_hidden_state"],
-            dynamic_axes={
-                "input_ids": {0: "batch_size", 1: "sequence_length"},
-                "last_hidden_state": {0: "batch_size", 1: "sequence_length"}
-            },
-            opset_version=17,  # 使用更高的opset版本
-            do_constant_folding=True,
-            verbose=False
-        )
+        with torch.no_grad():
+            torch.onnx.export(
+                wrapped_model,
+                (input_ids, attention_mask, position_ids, *dummy_past),
+                output_path,
+                input_names=input_names,
+                output_names=output_names,
+                dynamic_axes=dynamic_axes,
+                opset_version=17,  # 使用更高的opset版本
+                do_constant_folding=True,
+                verbose=False
+            )
+        save_external_data(output_path)
         print(f"✅ ONNX模型导出成功: {output_path}")
-        return True
     except Exception as e:
         print(f"❌ ONNX导出失败: {e}")
-        import traceback
-        traceback.print_exc()
+        if os.environ.get("INFERUNITY_DEBUG"):
+            import traceback
+            traceback.print_exc()
         return False
+    
+    if validate:
+        try:
+            tokenizer = _qwen_loader.load_tokenizer(model_path)
+            padding = "max_length" if static_shapes else True
+            inputs = tokenizer("Hello, how are you?", return_tensors="np", padding=padding,
+                               truncation=True, max_length=max_length)
+            if static_shapes:
+                validate_onnx(output_path, inputs["input_ids"])
+            else:
+                validate_decoder_with_past(output_path, inputs["input_ids"])
+        except Exception as e:
+            print(f"❌ 验证失败: {e}")
+            return False
+    return True
 
 def main():
     parser = argparse.ArgumentParser(description="将Qwen2.5-0.5B模型转换为ONNX格式")
@@ -133,6 +216,12 @@ def main():
                        help="输出ONNX文件路径")
     parser.add_argument("--max_length", type=int, default=128,
                        help="最大序列长度")
+    parser.add_argument("--static_shapes", action="store_true",
+                       help="torch.onnx.export导出固定形状（seq_len=max_length）、不带KV cache的模型")
+    parser.add_argument("--validate", action="store_true",
+                       help="torch.onnx.export导出后用onnxruntime运行一次检查")
+    parser.add_argument("--quantize", choices=["int8"], default=None,
+                       help="导出后进行量化（int8: 动态INT8量化）")
     
     args = parser.parse_args()
     
@@ -148,7 +237,8 @@ def main():
         print(f"创建输出目录: {output_dir}")
     
     # 转换模型
-    success = convert_to_onnx(args.model_path, args.output, args.max_length)
+    success = convert_to_onnx(args.model_path, args.output, args.max_length,
+                              args.static_shapes, args.validate)
     
     if success:
         # 显示文件信息
@@ -157,6 +247,8 @@ def main():
             print(f"\n✅ 转换完成!")
             print(f"   文件: {args.output}")
             print(f"   大小: {size_mb:.2f} MB")
+            if args.quantize == "int8":
+                quantize_int8(args.output)
         return 0
     else:
         return 1
@@ -8,8 +8,11 @@ import os
 import sys
 import argparse
 
+from _onnx_files import quantize_int8
+
 try:
-    from transformers import AutoModel, AutoTokenizer
+    import torch
+    import _qwen_loader
     from transformers.onnx import export, FeaturesManager
     USE_TRANSFORMERS_EXPORT = True
 except ImportError:
@@ -24,15 +27,14 @@ def convert_with_transformers(model_path, output_path):
     
     print(f"正在加载模型: {model_path}")
     try:
-        model = AutoModel.from_pretrained(model_path, torch_dtype="auto")
-        tokenizer = AutoTokenizer.from_pretrained(model_path)
+        # 导出FP32图：load()按checkpoint精度（bf16）加载，onnxruntime无法量化bf16权重
+        model = _qwen_loader.cast(_qwen_loader.load(model_path), torch.float32)
+        tokenizer = _qwen_loader.load_tokenizer(model_path)
         print("✅ 模型加载成功")
     except Exception as e:
         print(f"❌ 加载模型失败: {e}")
         return False
     
-    model.eval()
-    
     # 创建输出目录
     output_dir = os.path.dirname(output_path)
     if output_dir and not os.path.exists(output_dir):
@@ -45,20 +47,22 @@ def convert_with_transformers(model_path, output_path):
         onnx_config = model_onnx_config(model.config)
         
         # 导出ONNX
-        export(
-            tokenizer,
-            model,
-            onnx_config,
-            opset=14,  # 使用opset 14
-            output=output_path,
-        )
+        with torch.no_grad():
+            export(
+                tokenizer,
+                model,
+                onnx_config,
+                opset=14,  # 使用opset 14
+                output=output_path,
+            )
         
         print(f"✅ ONNX模型导出成功: {output_path}")
         return True
     except Exception as e:
         print(f"❌ ONNX导出失败: {e}")
-        import traceback
-        traceback.print_exc()
+        if os.environ.get("INFERUNITY_DEBUG"):
+            import traceback
+            traceback.print_exc()
         return False
 
 def main():
@@ -69,6 +73,8 @@ def main():
     parser.add_argument("--output", type=str,
                        default="models/Qwen2.5-0.5B/qwen2.5-0.5b.onnx",
                        help="输出ONNX文件路径")
+    parser.add_argument("--quantize", choices=["int8"], default=None,
+                       help="导出后进行量化（int8: 动态INT8量化）")
     
     args = parser.parse_args()
     
@@ -83,6 +89,8 @@ def main():
         print(f"\n✅ 转换完成!")
         print(f"   文件: {args.output}")
         print(f"   大小: {size_mb:.2f} MB")
+        if args.quantize == "int8":
+            quantize_int8(args.output)
         return 0
     else:
         return 1
@@ -9,26 +9,27 @@ import os
 
 # 先应用补丁
 sys.path.insert(0, os.path.dirname(__file__))
-import patch_torch_rmsnorm
+import _compat
 
 # 然后导入optimum
 try:
     from optimum.exporters.onnx.convert import onnx_export_from_model
     from optimum.exporters.onnx.config import TextDecoderOnnxConfig
-    from transformers import AutoModel, AutoTokenizer
     import torch
+    import _qwen_loader
+    from _onnx_files import quantize_int8
 except ImportError as e:
     print(f"❌ 导入失败: {e}")
     sys.exit(1)
 
-def convert_qwen_to_onnx(model_path, output_dir, opset=14):
+def convert_qwen_to_onnx(model_path, output_dir, opset=14, dtype="fp32"):
     """转换Qwen模型为ONNX"""
     print(f"正在加载模型: {model_path}")
     
     try:
-        model = AutoModel.from_pretrained(model_path, torch_dtype=torch.float32)
-        tokenizer = AutoTokenizer.from_pretrained(model_path)
-        model.eval()
+        # 加载后按导出精度转换权重（optimum按模型的dtype导出）
+        model = _qwen_loader.cast(_qwen_loader.load(model_path), _qwen_loader.EXPORT_DTYPES[dtype])
+        tokenizer = _qwen_loader.load_tokenizer(model_path)
         print("✅ 模型加载成功")
     except Exception as e:
         print(f"❌ 模型加载失败: {e}")
@@ -49,20 +50,22 @@ def convert_qwen_to_onnx(model_path, output_dir, opset=14):
             task="text-generation"
         )
         
-        onnx_export_from_model(
-            model=model,
-            output=output_dir,
-            opset=opset,
-            config=onnx_config,
-            input_shapes={"input_ids": input_ids.shape},
-        )
+        with torch.no_grad():
+            onnx_export_from_model(
+                model=model,
+                output=output_dir,
+                opset=opset,
+                config=onnx_config,
+                input_shapes={"input_ids": input_ids.shape},
+            )
         
         print(f"✅ ONNX模型导出成功: {output_dir}")
         return True
     except Exception as e:
         print(f"❌ ONNX导出失败: {e}")
-        import traceback
-        traceback.print_exc()
+        if os.environ.get("INFERUNITY_DEBUG"):
+            import traceback
+            traceback.print_exc()
         return False
 
 if __name__ == "__main__":
@@ -71,8 +74,18 @@ if __name__ == "__main__":
     parser.add_argument("--model_path", default="models/Qwen2.5-0.5B")
     parser.add_argument("--output", default="models/Qwen2.5-0.5B/onnx")
     parser.add_argument("--opset", type=int, default=14)
+    parser.add_argument("--quantize", choices=["int8"], default=None)
+    parser.add_argument("--dtype", choices=sorted(_qwen_loader.EXPORT_DTYPES), default="fp32")
     args = parser.parse_args()
+    # onnxruntime的动态INT8量化不支持bfloat16的权重
+    if args.dtype == "bf16" and args.quantize:
+        parser.error("--dtype bf16 不能与 --quantize 同时使用")
     
-    success = convert_qwen_to_onnx(args.model_path, args.output, args.opset)
+    success = convert_qwen_to_onnx(args.model_path, args.output, args.opset, args.dtype)
+    if success and args.quantize == "int8":
+        # 输出为目录，量化其中每个导出的模型
+        for name in sorted(os.listdir(args.output)):
+            if name.endswith(".onnx") and not name.endswith(".int8.onnx"):
+                quantize_int8(os.path.join(args.output, name))
     sys.exit(0 if success else 1)
 
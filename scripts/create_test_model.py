@@ -8,6 +8,19 @@ import onnx
 from onnx import helper, TensorProto
 import numpy as np
 
+# protobuf单文件上限
+PROTOBUF_LIMIT = 2 * 1024 * 1024 * 1024
+
+def save_model(model, path):
+    """保存并验证模型；超过2GB时使用外部数据格式，只做结构检查"""
+    if model.ByteSize() > PROTOBUF_LIMIT:
+        onnx.save(model, path, save_as_external_data=True)
+        # 按路径检查，不遍历权重数据
+        onnx.checker.check_model(path, full_check=False)
+    else:
+        onnx.checker.check_model(model)
+        onnx.save(model, path)
+
 def create_simple_add_model():
     """创建一个简单的Add模型：output = input1 + input2"""
     print("创建简单的Add模型...")
@@ -38,9 +51,6 @@ def create_simple_add_model():
     # 创建模型
     model = helper.make_model(graph, producer_name='inferunity_test')
     
-    # 验证模型
-    onnx.checker.check_model(model)
-    
     return model
 
 def create_simple_conv_model():
@@ -52,7 +62,7 @@ def create_simple_conv_model():
     
     # 权重: [1, 1, 3, 3]
     weight_data = np.ones((1, 1, 3, 3), dtype=np.float32) * 0.1
-    weight = helper.make_tensor('weight', TensorProto.FLOAT, [1, 1, 3, 3], weight_data.flatten())
+    weight = helper.make_tensor('weight', TensorProto.FLOAT, [1, 1, 3, 3], weight_data.tobytes(), raw=True)
     
     # Conv节点
     conv_output = helper.make_tensor_value_info('conv_output', TensorProto.FLOAT, [1, 1, 3, 3])
@@ -87,8 +97,73 @@ def create_simple_conv_model():
     # 创建模型
     model = helper.make_model(graph, producer_name='inferunity_test')
     
-    # 验证模型
-    onnx.checker.check_model(model)
+    return model
+
+def create_simple_conv_nhwc_model():
+    """
+    创建NHWC(channels_last)布局的Conv+Relu模型：Transpose -> Conv -> Relu -> Transpose
+    ONNX的Conv只接受NCHW输入和OIHW权重，所以用一对Transpose包住Conv；
+    ORT的布局优化会把Conv换成NHWC实现并消掉这对Transpose。
+    注意：只有执行提供者支持NHWC Conv时才会折叠，否则两个Transpose会按原样执行。
+    """
+    print("创建NHWC布局的Conv+Relu模型...")
+    
+    # 输入: [1, 5, 5, 1] (NHWC)
+    input_tensor = helper.make_tensor_value_info('input', TensorProto.FLOAT, [1, 5, 5, 1])
+    
+    # 权重: [1, 1, 3, 3] (OIHW，由优化器负责重排)
+    weight_data = np.ones((1, 1, 3, 3), dtype=np.float32) * 0.1
+    weight = helper.make_tensor('weight', TensorProto.FLOAT, [1, 1, 3, 3], weight_data.tobytes(), raw=True)
+    
+    # NHWC -> NCHW
+    to_nchw_node = helper.make_node(
+        'Transpose',
+        ['input'],
+        ['input_nchw'],
+        name='to_nchw',
+        perm=[0, 3, 1, 2]
+    )
+    
+    # Conv节点
+    conv_node = helper.make_node(
+        'Conv',
+        ['input_nchw', 'weight'],
+        ['conv_output'],
+        name='conv_node',
+        kernel_shape=[3, 3],
+        pads=[0, 0, 0, 0],
+        strides=[1, 1]
+    )
+    
+    # Relu节点
+    relu_node = helper.make_node(
+        'Relu',
+        ['conv_output'],
+        ['relu_output'],
+        name='relu_node'
+    )
+    
+    # NCHW -> NHWC
+    output = helper.make_tensor_value_info('output', TensorProto.FLOAT, [1, 3, 3, 1])
+    to_nhwc_node = helper.make_node(
+        'Transpose',
+        ['relu_output'],
+        ['output'],
+        name='to_nhwc',
+        perm=[0, 2, 3, 1]
+    )
+    
+    # 创建图
+    graph = helper.make_graph(
+        [to_nchw_node, conv_node, relu_node, to_nhwc_node],
+        'simple_conv_nhwc_model',
+        [input_tensor],
+        [output],
+        [weight]  # 初始值
+    )
+    
+    # 创建模型
+    model = helper.make_model(graph, producer_name='inferunity_test')
     
     return model
 
@@ -103,7 +178,7 @@ if __name__ == '__main__':
     # 创建Add模型
     add_model = create_simple_add_model()
     add_path = os.path.join(output_dir, 'simple_add.onnx')
-    onnx.save(add_model, add_path)
+    save_model(add_model, add_path)
     print(f"✓ Add模型已保存: {add_path}")
     print(f"  输入: input1[2,3], input2[2,3]")
     print(f"  输出: output[2,3] = input1 + input2")
@@ -112,7 +187,7 @@ if __name__ == '__main__':
     try:
         conv_model = create_simple_conv_model()
         conv_path = os.path.join(output_dir, 'simple_conv.onnx')
-        onnx.save(conv_model, conv_path)
+        save_model(conv_model, conv_path)
         print(f"\n✓ Conv模型已保存: {conv_path}")
         print(f"  输入: input[1,1,5,5]")
         print(f"  输出: output[1,1,3,3] = Relu(Conv(input))")
@@ -120,6 +195,17 @@ if __name__ == '__main__':
         print(f"\n⚠ Conv模型创建失败: {e}")
         print("  仅创建Add模型")
     
+    # 创建NHWC布局的Conv模型
+    try:
+        conv_nhwc_model = create_simple_conv_nhwc_model()
+        conv_nhwc_path = os.path.join(output_dir, 'simple_conv_nhwc.onnx')
+        save_model(conv_nhwc_model, conv_nhwc_path)
+        print(f"\n✓ NHWC Conv模型已保存: {conv_nhwc_path}")
+        print(f"  输入: input[1,5,5,1]")
+        print(f"  输出: output[1,3,3,1] = Relu(Conv(input))")
+    except Exception as e:
+        print(f"\n⚠ NHWC Conv模型创建失败: {e}")
+    
     print(f"\n测试模型已创建在: {output_dir}/")
     print("可以使用以下命令测试:")
     print(f"  ./build/bin/inference_example {add_path}")
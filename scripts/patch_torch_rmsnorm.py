@@ -4,27 +4,76 @@
 用于解决optimum库的依赖问题
 """
 
+from typing import Optional
+
 import torch
 import torch.nn as nn
+import torch.nn.functional as F
 
-# 如果torch没有rms_norm，添加一个简单的实现
+# 如果torch没有rms_norm，添加一个实现
 if not hasattr(torch, 'rms_norm'):
-    def rms_norm(input, normalized_shape, weight=None, eps=1e-5):
-        """
-        简单的RMSNorm实现
-        RMSNorm(x) = x / sqrt(mean(x^2) + eps) * weight
-        """
-        # 计算均方根
-        variance = input.pow(2).mean(-1, keepdim=True)
-        input = input * torch.rsqrt(variance + eps)
-        
-        if weight is not None:
-            input = input * weight
-        
-        return input
-    
-    # 添加到torch模块
-    torch.rms_norm = rms_norm
+    if hasattr(F, 'rms_norm'):
+        # 优先使用PyTorch自带的融合实现
+        torch.rms_norm = F.rms_norm
+    else:
+        @torch.jit.script
+        def _rms(x: torch.Tensor, weight: Optional[torch.Tensor], eps: float) -> torch.Tensor:
+            """平方-求均值-rsqrt-缩放融合为一次遍历，避免物化input.pow(2)中间张量"""
+            variance = (x * x).mean(-1, keepdim=True)
+            y = x * torch.rsqrt(variance + eps)
+            if weight is not None:
+                y = y * weight
+            return y
+
+        class _RMSNormFunction(torch.autograd.Function):
+            """Python实现的RMSNorm，导出ONNX时生成单个节点而不是四个基础算子"""
+
+            @staticmethod
+            def forward(ctx, input, weight, normalized_shape, eps):
+                return _rms(input, weight, eps)
+
+            @staticmethod
+            def symbolic(g, input, weight, normalized_shape, eps):
+                # SimplifiedLayerNormalization即RMSNorm（无均值减法），ONNX Runtime
+                # 在默认域注册该算子，inferunity也将其作为RMSNorm的别名
+                if weight is None:
+                    weight = g.op("Constant", value_t=torch.ones(normalized_shape))
+                return g.op(
+                    "SimplifiedLayerNormalization",
+                    input,
+                    weight,
+                    axis_i=-1,
+                    epsilon_f=eps
+                )
+
+        def rms_norm(input, normalized_shape, weight=None, eps=1e-5):
+            """
+            简单的RMSNorm实现
+            RMSNorm(x) = x / sqrt(mean(x^2) + eps) * weight
+            """
+            eps = eps if eps is not None else 1e-5
+            # _RMSNormFunction没有backward，只在导出时使用；其它情况保持可求导
+            if torch.onnx.is_in_onnx_export():
+                return _RMSNormFunction.apply(input, weight, normalized_shape, eps)
+            return _rms(input, weight, eps)
+
+        # 添加到torch模块
+        torch.rms_norm = rms_norm
+
+        # ONNX checker不认识默认域的SimplifiedLayerNormalization（ONNX Runtime的扩展算子），
+        # torch.onnx.export写出文件后检查失败会抛出CheckerError。文件已完整写出，
+        # 只有该算子导致的检查失败时保留导出结果；须在导入optimum之前替换
+        _onnx_export = torch.onnx.export
+
+        def _export(*args, **kwargs):
+            try:
+                return _onnx_export(*args, **kwargs)
+            except torch.onnx.errors.CheckerError as e:
+                if "SimplifiedLayerNormalization" not in str(e):
+                    raise
+                print("⚠️  ONNX checker不认识SimplifiedLayerNormalization，已保留导出的模型")
+
+        torch.onnx.export = _export
     print("✓ 已为torch添加rms_norm函数")
 
 # 验证
@@ -33,3 +82,45 @@ if hasattr(torch, 'rms_norm'):
 else:
     print("✗ torch.rms_norm仍不可用")
 
+
+def _check_export():
+    """导出一个只调用torch.rms_norm的小模型，检查生成的节点和数值"""
+    import os
+    import tempfile
+    import numpy as np
+    import onnx
+
+    class _Model(nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.weight = nn.Parameter(torch.rand(16))
+
+        def forward(self, x):
+            return torch.rms_norm(x, (16,), self.weight, 1e-6)
+
+    model = _Model().eval()
+    x = torch.randn(2, 4, 16)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "rms_norm.onnx")
+        with torch.no_grad():
+            torch.onnx.export(model, (x,), path, input_names=["x"], output_names=["y"],
+                              opset_version=17)
+        op_types = [node.op_type for node in onnx.load(path).graph.node]
+        print(f"导出的算子: {op_types}")
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            print("⚠️  未安装onnxruntime，跳过数值检查")
+            return
+        session = ort.InferenceSession(path, providers=["CPUExecutionProvider"])
+        (y,) = session.run(None, {"x": x.numpy()})
+    with torch.no_grad():
+        expected = torch.rms_norm(x, (16,), model.weight, 1e-6).numpy()
+    if np.allclose(y, expected, atol=1e-5):
+        print("✓ 导出的RMSNorm与PyTorch结果一致")
+    else:
+        print(f"✗ 导出的RMSNorm与PyTorch结果不一致 (max diff={np.abs(y - expected).max():.3e})")
+
+
+if __name__ == "__main__":
+    _check_export()
@@ -119,7 +119,7 @@ public:
             "Conv", "Relu", "Sigmoid", "Tanh", "Gelu", "GELU", "Silu", "SiLU", "Swish",
             "MatMul", "Add", "Mul", "Sub",
             "MaxPool", "AvgPool", "AveragePool", "GlobalMaxPool", "GlobalAvgPool",
-            "BatchNormalization", "LayerNormalization", "RMSNorm",
+            "BatchNormalization", "LayerNormalization", "RMSNorm", "SimplifiedLayerNormalization",
             "Softmax", "LogSoftmax",
             // 形状操作
             "Reshape", "Concat", "Split", "Transpose", "Gather", "Slice",
@@ -196,6 +196,15 @@ Status InferenceSession::LoadAndOptimizeGraph() {
         }
     }
     
+    // 保存优化后的图，便于离线检查融合结果
+    if (!options_.optimized_model_filepath.empty()) {
+        status = graph_->Serialize(options_.optimized_model_filepath);
+        if (!status.IsOk()) {
+            // 保存失败不影响加载，只记录警告
+            LOG_WARNING("Failed to save optimized graph: " + status.Message());
+        }
+    }
+    
     // 分配执行提供者 (参考ONNX Runtime的节点分配)
     std::vector<ExecutionProvider*> provider_ptrs;
     for (const auto& provider : execution_providers_) {
@@ -273,6 +273,14 @@ public:
 
 REGISTER_OPERATOR("RMSNorm", RMSNormOperator);
 
+// SimplifiedLayerNormalization（ONNX Runtime中RMSNorm的算子名），与RMSNorm实现相同
+class SimplifiedLayerNormalizationOperator : public RMSNormOperator {
+public:
+    std::string GetName() const override { return "SimplifiedLayerNormalization"; }
+};
+
+REGISTER_OPERATOR("SimplifiedLayerNormalization", SimplifiedLayerNormalizationOperator);
+
 } // namespace operators
 } // namespace inferunity
 
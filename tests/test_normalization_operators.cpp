@@ -231,3 +231,30 @@ TEST_F(NormalizationOperatorsTest, RMSNormShapeInference) {
     EXPECT_EQ(output_shapes[0].dims, input->GetShape().dims);
 }
 
+
+// 测试 SimplifiedLayerNormalization（RMSNorm的别名）与RMSNorm结果一致
+TEST_F(NormalizationOperatorsTest, SimplifiedLayerNormalizationMatchesRMSNorm) {
+    auto input = CreateTestTensor(Shape({2, 4}), {1.0f, 2.0f, 3.0f, 4.0f, 5.0f, 6.0f, 7.0f, 8.0f});
+    auto scale = CreateTestTensor(Shape({4}), {0.5f, 1.0f, 1.5f, 2.0f});
+    auto rms_output = CreateTestTensor(Shape({2, 4}), {0.0f, 0.0f, 0.0f, 0.0f, 0.0f, 0.0f, 0.0f, 0.0f});
+    auto simplified_output = CreateTestTensor(Shape({2, 4}), {0.0f, 0.0f, 0.0f, 0.0f, 0.0f, 0.0f, 0.0f, 0.0f});
+    
+    auto rms_op = OperatorRegistry::Instance().Create("RMSNorm");
+    auto simplified_op = OperatorRegistry::Instance().Create("SimplifiedLayerNormalization");
+    ASSERT_NE(rms_op, nullptr);
+    ASSERT_NE(simplified_op, nullptr);
+    
+    std::vector<Tensor*> inputs = {input.get(), scale.get()};
+    std::vector<Tensor*> rms_outputs = {rms_output.get()};
+    std::vector<Tensor*> simplified_outputs = {simplified_output.get()};
+    
+    ExecutionContext ctx;
+    EXPECT_TRUE(rms_op->Execute(inputs, rms_outputs, &ctx).IsOk());
+    EXPECT_TRUE(simplified_op->Execute(inputs, simplified_outputs, &ctx).IsOk());
+    
+    const float* rms_data = static_cast<const float*>(rms_output->GetData());
+    const float* simplified_data = static_cast<const float*>(simplified_output->GetData());
+    for (size_t i = 0; i < rms_output->GetElementCount(); ++i) {
+        EXPECT_FLOAT_EQ(simplified_data[i], rms_data[i]);
+    }
+}
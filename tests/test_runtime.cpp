@@ -7,6 +7,9 @@
 #include "inferunity/tensor.h"
 #include "inferunity/types.h"
 #include <vector>
+#include <fstream>
+#include <iterator>
+#include <cstdio>
 
 using namespace inferunity;
 
@@ -194,3 +197,41 @@ TEST_F(RuntimeTest, GraphOptimization) {
     // 注意：这需要访问内部图结构，简化测试
 }
 
+
+// 测试保存优化后的图
+TEST_F(RuntimeTest, SaveOptimizedGraph) {
+    auto graph = std::make_unique<Graph>();
+    
+    Value* input = graph->AddValue();
+    Value* output = graph->AddValue();
+    Node* relu = graph->AddNode("Relu", "relu1");
+    
+    relu->AddInput(input);
+    relu->AddOutput(output);
+    
+    graph->AddInput(input);
+    graph->AddOutput(output);
+    
+    // 每个测试使用独立的临时文件，避免并行运行时互相覆盖
+    const std::string path = ::testing::TempDir() +
+        ::testing::UnitTest::GetInstance()->current_test_info()->name() + ".txt";
+    std::remove(path.c_str());
+    
+    SessionOptions options;
+    options.optimized_model_filepath = path;
+    auto session = InferenceSession::Create(options);
+    ASSERT_NE(session, nullptr);
+    
+    Status status = session->LoadModelFromGraph(std::move(graph));
+    EXPECT_TRUE(status.IsOk());
+    
+    // 验证文件已写出，并包含优化后图中的节点
+    std::ifstream file(path);
+    ASSERT_TRUE(file.is_open());
+    std::string content((std::istreambuf_iterator<char>(file)),
+                        std::istreambuf_iterator<char>());
+    file.close();
+    EXPECT_NE(content.find("Relu"), std::string::npos);
+    
+    std::remove(path.c_str());
+}